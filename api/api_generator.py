@@ -1,31 +1,89 @@
 """ Frontend API generator """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, HTTPException, Depends
+from pydantic import BaseModel, Field
 from core.method_generator import AutoDB
 from service_definitions.registry import TASKS
+from api.dependencies import get_db
+import asyncio
 
-db = AutoDB()
-app = FastAPI()
+REQUEST_COLUMNS = ("user_id", "text", "status")
+
+
+class ServiceRequest(BaseModel):
+    """ Body of a service request, values are checked before the request is queued for insert_writer """
+
+    # range of SQLite INTEGER
+    user_id: int = Field(ge=-2 ** 63, lt=2 ** 63)
+    text: str = ""
+
+
+# declared return types let FastAPI serialize responses with pydantic directly, without the jsonable_encoder pass
+class AcceptedResponse(BaseModel):
+    message: str
+    user_id: int
+
+
+class StatusRow(BaseModel):
+    status: str | None = None
+    image_url: str | None = None
+
+
+class StatusResponse(BaseModel):
+    results: list[StatusRow]
+
+
+# services are known at import time, so per-service tables and queries are built once
+_TABLES = {service: f"{service}_requests" for service in TASKS}
+_STATUS_QUERIES = {
+    service: f"SELECT status, image_url FROM {table} WHERE user_id=?" for service, table in _TABLES.items()
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """ Opens database for the app lifetime and runs background writer for queued service requests """
+
+    # owned by the app, so closing it on shutdown doesn't pull AutoDB.shared() from under other holders
+    db = AutoDB()
+    app.state.db = db
+    insert_writer = asyncio.create_task(db.insert_writer())
+    try:
+        yield
+    finally:
+        # on cancel the writer waits for its running write, so nothing touches the database after close()
+        insert_writer.cancel()
+        with suppress(asyncio.CancelledError):
+            await insert_writer
+        try:
+            # rows already answered with "Accepted", a failure here must surface
+            db.flush_inserts()
+        finally:
+            db.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.post("/api/{service}/handle")
-async def handle_service(service: str, payload: dict):
+async def handle_service(service: str, payload: ServiceRequest, db: AutoDB = Depends(get_db)) -> AcceptedResponse:
     """ Service handler endpoint """
 
-    if service not in TASKS:
-        return {"error": "Unknown service"}
-    table = f"{service}_requests"
-    user_id = payload["user_id"]
-    text = payload.get("text", "")
-    db.execute(f"INSERT INTO {table} (user_id, text, status) VALUES (?, ?, ?)",
-               (user_id, text, "pending"))
-    return {"message": "Accepted", "user_id": user_id}
+    table = _TABLES.get(service)
+    if table is None:
+        raise HTTPException(status_code=404, detail="Unknown service")
+    # written in batches by insert_writer
+    db.enqueue_insert(table, REQUEST_COLUMNS, (payload.user_id, payload.text, "pending"))
+    return AcceptedResponse(message="Accepted", user_id=payload.user_id)
 
 
 @app.get("/api/{service}/status/{user_id}")
-def get_status(service: str, user_id: int):
+async def get_status(service: str, user_id: int, db: AutoDB = Depends(get_db)) -> StatusResponse:
     """ User request status endpoint """
 
-    table = f"{service}_requests"
-    rows = db.execute(f"SELECT status, image_url FROM {table} WHERE user_id=?", (user_id,))
-    return {"results": rows}
+    query = _STATUS_QUERIES.get(service)
+    if query is None:
+        raise HTTPException(status_code=404, detail="Unknown service")
+    rows = await db.execute_async(query, (user_id,), is_select=True)
+    return StatusResponse(results=rows)
@@ -1,17 +1,64 @@
 """ Mass message API """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from core.method_generator import AutoDB
+from core.logger import logger
+from api.dependencies import get_db
 from aiogram import Bot
+import asyncio
 
 router = APIRouter()
-db = AutoDB()
+
+# Telegram allows about 30 messages per second
+SEND_CONCURRENCY = 30
+
+# tokens come from clients, so only this many bots (and HTTP sessions) are kept for reuse
+MAX_CACHED_BOTS = 8
+
+# one Bot (and its HTTP session) per token, reused between broadcasts
+_BOTS: dict[str, Bot] = {}
+
+
+async def _close_bot(bot: Bot):
+    """ Closes HTTP session of the bot """
+
+    session = bot.session
+    if session is not None:
+        await session.close()
+
+
+async def close_bots():
+    """ Closes HTTP sessions of cached bots, the app mounting the router calls it on shutdown """
+
+    for bot in _BOTS.values():
+        await _close_bot(bot)
+    _BOTS.clear()
 
 
 @router.post("/broadcast")
-async def broadcast_message(bot_token: str, message_text: str):
-    bot = Bot(token=bot_token)
-    user_ids = [row[0] for row in db.get_user_id_from_users()]
-    for user_id in user_ids:
-        await bot.send_message(user_id, message_text)
-    return {"sent_to": len(user_ids)}
+async def broadcast_message(bot_token: str, message_text: str, db: AutoDB = Depends(get_db)):
+    bot = _BOTS.get(bot_token)
+    # once the cache is full, bots of new tokens live for this broadcast only
+    temporary = bot is None and len(_BOTS) >= MAX_CACHED_BOTS
+    if bot is None:
+        bot = Bot(token=bot_token)
+        if not temporary:
+            _BOTS[bot_token] = bot
+
+    try:
+        user_ids = await asyncio.to_thread(db.fetch_column, "users", "user_id")
+        semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+
+        async def send(user_id):
+            async with semaphore:
+                await bot.send_message(user_id, message_text)
+
+        results = await asyncio.gather(*(send(user_id) for user_id in user_ids), return_exceptions=True)
+    finally:
+        if temporary:
+            await _close_bot(bot)
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        logger.error("Broadcast failed for %s of %s users, first error: %r", len(errors), len(user_ids), errors[0])
+    return {"sent_to": len(user_ids) - len(errors)}
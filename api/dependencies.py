@@ -0,0 +1,10 @@
+""" Shared API dependencies """
+
+from fastapi import Request
+from core.method_generator import AutoDB
+
+
+def get_db(request: Request) -> AutoDB:
+    """ Database opened by the app lifespan """
+
+    return request.app.state.db
@@ -12,6 +12,8 @@ GREEN = "\033[32m"
 MAGENTA = "\033[35m"
 CYAN = "\033[36m"
 
+LOG_FORMAT = "[%(levelname)s] %(name)s: %(message)s"
+
 
 class ColorFormatter(logging.Formatter):
     """ Colorful formatter for log output """
@@ -24,12 +26,20 @@ class ColorFormatter(logging.Formatter):
         logging.CRITICAL: RED,
     }
 
+    def __init__(self, fmt: str = LOG_FORMAT):
+        super().__init__(f"{RESET}{fmt}{RESET}")
+        # colors are baked into format string of every level once
+        self.formatters = {
+            level: logging.Formatter(f"{color}{fmt}{RESET}") for level, color in self.COLORS.items()
+        }
+
     def format(self, record):
         """ Formats logs """
 
-        color = self.COLORS.get(record.levelno, RESET)
-        message = super().format(record)
-        return f"{color}{message}{RESET}"
+        formatter = self.formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
+        return formatter.format(record)
 
 
 def setup_logger():
@@ -43,7 +53,7 @@ def setup_logger():
         return logger
 
     handler = logging.StreamHandler(sys.stdout)
-    formatter = ColorFormatter("[%(levelname)s] %(name)s: %(message)s")
+    formatter = ColorFormatter(LOG_FORMAT)
     handler.setFormatter(formatter)
 
     logger.addHandler(handler)
@@ -10,7 +10,7 @@ async def main():
     logger.info("=== Core system starting ===")
 
     if TASKS:
-        logger.info(f"Loaded services: {', '.join(TASKS.keys())}")
+        logger.info("Loaded services: %s", ", ".join(TASKS))
     else:
         logger.warning("No services loaded")
 
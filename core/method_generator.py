@@ -1,40 +1,270 @@
 """ Database with auto generated methods """
 
+from contextlib import contextmanager, suppress
+from functools import lru_cache
+from operator import itemgetter
+from pathlib import Path
 from logger import logger
-import inspect
+import threading
+import asyncio
+import logging
 import sqlite3
+import queue
+import sys
 import re
 import os
 
+# operations generated method names start with
+_OPERATIONS = frozenset(("get", "set", "update", "delete"))
+
+# tables and columns referenced by a query, found in a single pass:
+# selected columns | INSERT INTO table (columns) | FROM/JOIN/UPDATE table | WHERE/SET column =
+_RE_SQL_SCANNER = re.compile(
+    r"\bselect\s+(?P<selected>.*?)\s+(?=from\b)"
+    r"|\binsert\s+into\s+(?P<insert_table>\w+)(?:\s*\((?P<inserted>.*?)\))?"
+    r"|\b(?:from|join|update)\s+(?P<table>\w+)"
+    r"|\b(?:where|set)\s+(?P<column>\w+)\s*=",
+    re.IGNORECASE,
+)
+_RE_DML = re.compile(r"\s*(?:insert|update|delete|replace)\b", re.IGNORECASE)
+_RE_SELECT = re.compile(r"\s*select\b", re.IGNORECASE)
+_RE_SCHEMA_CHANGE = re.compile(r"\s*(?:create|alter|drop)\s", re.IGNORECASE)
+
+
+def _splits(text: str, sep: str):
+    """ Yields (left, right) splits of text at sep from the rightmost one, both parts non-empty """
+
+    end = len(text)
+    while (i := text.rfind(sep, 0, end)) > 0:
+        if i + len(sep) < len(text):
+            yield text[:i], text[i + len(sep):]
+        end = i + len(sep) - 1
+
+
+def _tokenize_method_name(name: str, statuses) -> tuple[str, dict] | None:
+    """
+    Splits method name into its format kind (handled by AutoDB._parse_{kind}) and parts.
+    Formats are checked in order of priority, the rightmost keyword wins like in a greedy regex.
+    """
+
+    # parts land in SQL as identifiers, anything but \w characters is not a method name
+    if not name.isidentifier():
+        return None
+
+    operation, _, body = name.partition("_")
+    if not body:
+        return None
+
+    if operation == "set":
+        table = body.removesuffix("_status")
+        if table and table != body:
+            return "set_status_method", {"table": table}
+
+        for columns, rest in _splits(body, "_with_"):
+            for status, table in _splits(rest, "_"):
+                return "set_with_status_table", {"columns": columns, "status": status, "table": table}
+
+        for column, rest in _splits(body, "_by_"):
+            for filter1, filter2 in _splits(rest, "_and_"):
+                return "set_by_two_columns", {"column": column, "filter1": filter1, "filter2": filter2}
+
+        for column, by_column in _splits(body, "_by_"):
+            return "set_by_column", {"column": column, "by_column": by_column}
+
+    elif operation == "get":
+        # only the greedy split is validated, an unknown status falls through to the next formats
+        split = next(
+            ((columns, status, table) for columns, rest in _splits(body, "_with_") for status, table in _splits(rest, "_")),
+            None,
+        )
+        if split is not None and split[1] in statuses:
+            columns, status, table = split
+            return "get_with_status_table", {"columns": columns, "status": status, "table": table}
+
+        for column, by_column in _splits(body, "_by_"):
+            return "get_by_column", {"column": column, "by_column": by_column}
+
+        return "get_simple_table", {"table": body}
+
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _is_busy_error(error: Exception) -> bool:
+    """ True for lock contention, which goes away on retry, unlike errors caused by the data itself """
+
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
 
 def _guess_table_from_method(name: str) -> str:
     """ Guesses table name from method name like get_image_by_id or set_image_by_user_id -> images """
 
-    match = re.match(r"(?:get|set|update|delete)_(\w+)_by_", name)
-    if match:
-        table = match.group(1)
-        if not table.endswith("s"):
-            table += "s"
-        return table
+    operation, _, body = name.partition("_")
+    if operation in _OPERATIONS and body:
+        # table is everything before the last _by_, or the whole rest of the name
+        by = body.rfind("_by_")
+        table = body[:by] if by > 0 else body
+        if f"_{table}".isidentifier():
+            if not table.endswith("s"):
+                table += "s"
+            return table
 
-    match = re.match(r"(?:get|set|update|delete)_(\w+)$", name)
-    if match:
-        table = match.group(1)
-        if not table.endswith("s"):
-            table += "s"
-        return table
     raise AttributeError(f"Cannot guess table name. Incorrect method name: {name}")
 
 
+@lru_cache(maxsize=None)
+def _short_filename(filename: str) -> str:
+    """ Basename of a source file, few distinct files ever call generated methods """
+
+    return os.path.basename(filename)
+
+
 def _log_call_context(method_name: str):
     """ Log method name, line and file """
 
-    frame = inspect.stack()[2]  # calling method
-    filename = os.path.basename(frame.filename)
-    lineno = frame.lineno
-    func = frame.function
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+
+    frame = sys._getframe(2)  # calling method
+    filename = _short_filename(frame.f_code.co_filename)
+    lineno = frame.f_lineno
+    func = frame.f_code.co_name
+
+    logger.debug("Generated method '%s' called from %s:%s in %s()", method_name, filename, lineno, func)
+
+
+@lru_cache(maxsize=512)
+def _analyze_sql(sql: str) -> tuple[frozenset[str], tuple[str, ...]]:
+    """ Detects tables and columns used by SQL query, cached by query string. Names are lowercased """
+
+    tables = set()
+    columns = []
+    for match in _RE_SQL_SCANNER.finditer(sql):
+        table, column, selected, insert_table, inserted = match.group(
+            "table", "column", "selected", "insert_table", "inserted"
+        )
+        if table:
+            tables.add(table.lower())
+        elif column:
+            columns.append(column.lower())
+        elif insert_table:
+            tables.add(insert_table.lower())
+            if inserted:
+                columns.extend(c.strip() for c in inserted.lower().split(","))
+        elif selected.strip() != "*" and "(" not in selected:
+            columns.extend(c.strip() for c in selected.lower().split(","))
+
+    return frozenset(tables), tuple(columns)
+
+
+# sources of generated get methods, see AutoDB._build_method
+# unbounded selects also define stream(), attached to the method as method.stream
+# values are repr()-ed, so SQL, table and columns become constants of the compiled function
+_GET_WITH_STATUS_SOURCE = '''
+def method():
+    """ Returns column(s) with specific status """
+
+    _log_call_context({name})
+    ensure({table}, {required})
+    logger.debug("Executing query with status=%s", {status})
+    with read_connection() as connection:
+        result = connection.execute({query}, ({status},)).fetchall()
+    logger.info("Returned %s rows for columns: %s", len(result), {columns})
+    return [dict(row) for row in result]
+
+
+def stream(size=batch_size):
+    """
+    Yields column(s) with specific status, fetching rows in batches.
+    Holds a pooled reader connection, exhaust or close() the stream to give it back.
+    """
+
+    _log_call_context({name})
+    ensure({table}, {required})
+    count = 0
+    for row in stream_rows({query}, ({status},), size):
+        count += 1
+        yield dict(row)
+    logger.info("Streamed %s rows for columns: %s", count, {columns})
+'''
+
+_GET_BY_COLUMN_SOURCE = '''
+def method(value):
+    """ Returns column selected by another column """
+
+    _log_call_context({name})
+    ensure({table}, {required})
+    with read_connection() as connection:
+        logger.debug("Executing query with %s=%s", {by_column}, value)
+        result = connection.execute({query}, (value,)).fetchall()
+    logger.info("Returned %s rows for column: %s", len(result), {column})
+    return [dict(row) for row in result]
+'''
+
+_GET_SIMPLE_TABLE_SOURCE = '''
+def method():
+    """ Returns all columns from the table """
+
+    _log_call_context({name})
+    ensure({table}, {required})
+    with read_connection() as connection:
+        result = connection.execute({query}).fetchall()
+    logger.info("Returned %s rows with columns: %s", len(result), schema.get({table}))
+    return [dict(row) for row in result]
+
+
+def stream(size=batch_size):
+    """
+    Yields all columns from the table, fetching rows in batches.
+    Holds a pooled reader connection, exhaust or close() the stream to give it back.
+    """
+
+    _log_call_context({name})
+    ensure({table}, {required})
+    count = 0
+    for row in stream_rows({query}, (), size):
+        count += 1
+        yield dict(row)
+    logger.info("Streamed %s rows with columns: %s", count, schema.get({table}))
+'''
+
+
+class _ReaderPool:
+    """ Pool of read-only connections shared by generated get methods """
+
+    def __init__(self, path: str, size: int, cached_statements: int, pragmas: tuple = (), timeout: float = 5):
+        self._connections = queue.Queue()
+        self._timeout = timeout
+        uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+        for _ in range(size):
+            connection = sqlite3.connect(
+                uri, uri=True, check_same_thread=False, cached_statements=cached_statements
+            )
+            connection.row_factory = sqlite3.Row
+            for pragma in pragmas:
+                connection.execute(pragma)
+            self._connections.put(connection)
+
+    @contextmanager
+    def acquire(self):
+        """ Borrows a read-only connection and returns it to the pool afterwards, raises TimeoutError if none frees up """
 
-    logger.debug(f"Generated method '{method_name}' called from {filename}:{lineno} in {func}()")
+        try:
+            connection = self._connections.get(timeout=self._timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"No free reader connection after {self._timeout}s, are streams left open?"
+            ) from None
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+    def close(self):
+        """ Closes every pooled connection """
+
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
 
 
 class AutoDB:
@@ -44,147 +274,186 @@ class AutoDB:
     Code-Driven Data Definition (CDDD)
     """
 
-    OPERATION_KEYWORDS = {"get", "set", "update", "delete"}
-    STATUS_KEYWORDS = {"uploaded", "pending", "processing", "waiting", "done", "error"}
-    QUERY_KEYWORDS = {"with", "by"}
-
-    def __init__(self, path="../database.db"):
-        self.connection = sqlite3.connect(path)
+    OPERATION_KEYWORDS = _OPERATIONS
+    STATUS_KEYWORDS = frozenset(("uploaded", "pending", "processing", "waiting", "done", "error"))
+    QUERY_KEYWORDS = frozenset(("with", "by"))
+
+    # guards caching of generated methods on the instance
+    _method_lock = threading.Lock()
+
+    # instances returned by AutoDB.shared(), one per database file
+    _shared: dict[str, "AutoDB"] = {}
+    _shared_lock = threading.Lock()
+
+    # size of sqlite3 prepared statement cache per connection
+    CACHED_STATEMENTS = 512
+
+    # queued inserts are flushed by insert_writer() in batches of this size or after this delay
+    INSERT_BATCH_SIZE = 256
+    INSERT_BATCH_DELAY = 0.005
+    # pause before writing again after a failed batch
+    INSERT_RETRY_DELAY = 1
+
+    # rows fetched at once by method.stream() of generated get methods
+    STREAM_BATCH_SIZE = 1000
+    # seconds to wait for a free reader connection before giving up
+    READER_TIMEOUT = 5
+
+    # writer settings, journal mode is stored in the database file
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+    )
+    # per-connection settings, applied to the writer and every reader
+    CONNECTION_PRAGMAS = (
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-64000",
+        "PRAGMA mmap_size=268435456",
+    )
+
+    def __init__(self, path="../database.db", readers: int = 4):
+        # single writer connection, transactions are opened explicitly in _transaction()
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, cached_statements=self.CACHED_STATEMENTS
+        )
         self.connection.row_factory = sqlite3.Row
-        self.cursor = self.connection.cursor()
-        logger.debug(f"Connected to database: {path}")
+        for pragma in (*self.PRAGMAS, *self.CONNECTION_PRAGMAS):
+            self.connection.execute(pragma)
+        self._write_lock = threading.RLock()
+        # {table: columns}, filled lazily and changed only by our own CREATE/ALTER
+        self._schema: dict[str, set[str]] = {}
+        # (table, columns) pairs already checked, lets hot paths skip even the schema lookup
+        self._verified: set[tuple[str, tuple]] = set()
+        self._insert_queue = asyncio.Queue()
+        # inserts taken off the queue, but not committed yet
+        self._pending_inserts = []
+        self._shared_key = None
+
+        # in-memory database can't be shared between connections, so reads go through the writer
+        self._readers = None
+        if readers and path != ":memory:":
+            self._readers = _ReaderPool(
+                path, readers, self.CACHED_STATEMENTS, self.CONNECTION_PRAGMAS, self.READER_TIMEOUT
+            )
+        logger.debug("Connected to database: %s | readers: %s", path, readers if self._readers else 0)
+
+    @classmethod
+    def shared(cls, path="../database.db", readers: int = 4) -> "AutoDB":
+        """ Returns process-wide instance for the database file, so its connections and caches are reused """
+
+        key = path if path == ":memory:" else str(Path(path).resolve())
+        with cls._shared_lock:
+            db = cls._shared.get(key)
+            if db is None:
+                db = cls._shared[key] = cls(path, readers)
+                db._shared_key = key
+        return db
 
     def __getattr__(self, name: str):
-        """ Dynamically create method based on its name """
-
-        if name.startswith("set_"):
-            for parser in (
-                    self._parse_set_status_method,
-                    self._parse_set_with_status_table,
-                    self._parse_set_by_two_columns,
-                    self._parse_set_by_column,
-            ):
-                method = parser(name)
-                if method:
-                    return method
-
-        if name.startswith("get_"):
-            for parser in (
-                    self._parse_get_with_status_table,
-                    self._parse_get_by_column,
-                    self._parse_get_simple_table
-            ):
-                method = parser(name)
-                if method:
-                    return method
-
-        raise AttributeError(f"Unknown method format: {name}")
+        """
+        Dynamically create method based on its name.
+        Generated method is stored on the instance, so __getattr__ is called only once per name.
+        """
+
+        # private and dunder lookups (copy, pickle, hasattr probes) are never generated methods
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        parsed = _tokenize_method_name(name, self.STATUS_KEYWORDS)
+        if parsed is None:
+            raise AttributeError(f"Unknown method format: {name}")
+
+        kind, groups = parsed
+        parser = getattr(self, f"_parse_{kind}")
+        # parts end up as schema cache keys and membership tests, interned they compare by identity
+        groups = {key: sys.intern(value) for key, value in groups.items()}
+        return self._remember_method(name, parser(name, **groups))
+
+    def precompile(self, names):
+        """ Generates methods ahead of time, so first calls on the hot path don't parse their names """
+
+        for name in names:
+            getattr(self, name)
+        logger.debug("Precompiled methods: %s", names)
+
+    def _remember_method(self, name: str, method):
+        """ Caches generated method on the instance so next lookups skip parsing """
+
+        with self._method_lock:
+            # another thread could have generated the same method already
+            cached = self.__dict__.get(name)
+            if cached is not None:
+                return cached
+            object.__setattr__(self, name, method)
+        return method
 
     # ------------------ Parsers ------------------
-    def _parse_get_with_status_table(self, name: str):
+    # Each parser gets parts of its format from _tokenize_method_name and builds the method
+    def _parse_get_with_status_table(self, name: str, columns: str, status: str, table: str):
         """ get_{column}_with_{status}_{table}() or get_{column}_and_{column}_with_{status}_{table}() """
 
-        match = re.match(r"^(get|set|update|delete)_(.+)_with_(\w+)_(\w+)$", name)
-        if not match:
-            return None
-
-        operation, columns_part, status, table = match.groups()
-        if operation not in self.OPERATION_KEYWORDS or status not in self.STATUS_KEYWORDS:
-            return None
-
-        columns = columns_part.split("_and_")
+        columns = tuple(columns.split("_and_"))
         placeholders = ", ".join(columns)
         query = f"SELECT {placeholders} FROM {table} WHERE status = ?"
-        _log_call_context(name)
-        logger.debug(f"Prepared SQL query: {query} | Status: {status}")
+        logger.debug("Prepared SQL query: %s | Status: %s", query, status)
 
-        def method():
-            """ Returns column(s) with specific status """
+        required = (*columns, "status")
+        values = {"table": table, "query": query, "required": required, "status": status, "columns": columns}
+        return self._build_method(name, _GET_WITH_STATUS_SOURCE, values)
 
-            _log_call_context(name)
-            self._ensure_table_and_columns(table, columns + ["status"])
-            logger.debug(f"Executing query with status={status}")
-            with self.connection:
-                self.cursor.execute(query, (status,))
-                result = self.cursor.fetchall()
-            logger.info(f"Returned {len(result)} rows for columns: {columns}")
-            return [dict(row) for row in result]
-
-        return method
-
-    def _parse_get_by_column(self, name: str):
+    def _parse_get_by_column(self, name: str, column: str, by_column: str):
         """ get_{column}_by_{column}(value) """
 
-        match = re.match(r"^(get|set|update|delete)_(\w+)_by_(\w+)$", name)
-        if not match:
-            return None
-
-        operation, column, by_column = match.groups()
-        if operation not in self.OPERATION_KEYWORDS:
-            return None
-
         table = _guess_table_from_method(name)
         query = f"SELECT {column} FROM {table} WHERE {by_column} = ?"
-        _log_call_context(name)
-        logger.debug(f"Prepared SQL query: {query}")
-
-        def method(value):
-            """ Returns column selected by another column """
-
-            _log_call_context(name)
-            self._ensure_table_and_columns(table, [column, by_column])
-            with self.connection:
-                logger.debug(f"Executing query with {by_column}={value}")
-                self.cursor.execute(query, (value,))
-                result = self.cursor.fetchall()
-            logger.info(f"Returned {len(result)} rows for column: {column}")
-            return [dict(row) for row in result]
+        logger.debug("Prepared SQL query: %s", query)
 
-        return method
+        required = (column, by_column)
+        values = {"table": table, "query": query, "required": required, "column": column, "by_column": by_column}
+        return self._build_method(name, _GET_BY_COLUMN_SOURCE, values)
 
-    def _parse_get_simple_table(self, name: str):
+    def _parse_get_simple_table(self, name: str, table: str):
         """ get_{table}() -> SELECT * FROM table """
 
-        match = re.match(r"^(get|set|update|delete)_(\w+)$", name)
-        if not match:
-            return None
-
-        operation, table = match.groups()
-        if operation not in self.OPERATION_KEYWORDS:
-            return None
-
         query = f"SELECT * FROM {table}"
-        _log_call_context(name)
-        logger.debug(f"Prepared SQL query: {query}")
-
-        def method():
-            """ Returns all columns from the table """
-
-            _log_call_context(name)
-            self._ensure_table_and_columns(table, [])
-            with self.connection:
-                self.cursor.execute(query)
-                result = self.cursor.fetchall()
-                self.cursor.execute(f"PRAGMA table_info({table})")
-                columns = [row[1] for row in self.cursor.fetchall()]
-            logger.info(f"Returned {len(result)} rows with columns: {columns}")
-            return [dict(row) for row in result]
-
+        logger.debug("Prepared SQL query: %s", query)
+
+        required = ()
+        values = {"table": table, "query": query, "required": required}
+        return self._build_method(name, _GET_SIMPLE_TABLE_SOURCE, values)
+
+    def _build_method(self, name: str, source: str, values: dict):
+        """ Compiles method from source template, parsed values are baked in as constants """
+
+        source = source.format(**{key: repr(value) for key, value in {"name": name, **values}.items()})
+        namespace = {
+            "_log_call_context": _log_call_context,
+            "logger": logger,
+            "ensure": self._ensure_table_and_columns,
+            "read_connection": self._read_connection,
+            "schema": self._schema,
+            "stream_rows": self._stream_rows,
+            "batch_size": self.STREAM_BATCH_SIZE,
+        }
+        exec(compile(source, f"<generated {name}>", "exec"), namespace)
+        method = namespace["method"]
+        # tracebacks and profilers show the generated name instead of "method"
+        method.__name__ = method.__qualname__ = name
+        if "stream" in namespace:
+            method.stream = namespace["stream"]
+            method.stream.__name__ = "stream"
+            method.stream.__qualname__ = f"{name}.stream"
         return method
 
-    def _parse_set_with_status_table(self, name: str):
+    def _parse_set_with_status_table(self, name: str, columns: str, status: str, table: str):
         """ set_{column}_with_{status}_{table}() or set_{column}_and_{column}_with_{status}_{table}() """
 
-        match = re.match(r"^set_(.+)_with_(\w+)_(\w+)$", name)
-        if not match:
-            return None
-
-        columns_part, status, table = match.groups()
-        columns = columns_part.split("_and_")
+        columns = columns.split("_and_")
         placeholders = ", ".join([f"{col}=?" for col in columns])
         query = f"UPDATE {table} SET {placeholders} WHERE status = ?"
-        _log_call_context(name)
-        logger.debug(f"Prepared SQL SET query: {query} | Status: {status}")
+        logger.debug("Prepared SQL SET query: %s | Status: %s", query, status)
+
+        required = (*columns, "status")
 
         def method(*values):
             """ Sets columns with status """
@@ -192,53 +461,37 @@ class AutoDB:
             _log_call_context(name)
             if len(values) != len(columns):
                 raise ValueError(f"Expected {len(columns)} values, got {len(values)}")
-            self._ensure_table_and_columns(table, columns + ["status"])
-            with self.connection:
-                self.cursor.execute(query, (*values, status))
-                self.connection.commit()
-                self.cursor.execute(f"SELECT * FROM {table} WHERE status = ?", (status,))
-                rows = self.cursor.fetchall()
-                self.cursor.execute(f"PRAGMA table_info({table})")
-                col_names = [row[1] for row in self.cursor.fetchall()]
-            return [dict(zip(col_names, row)) for row in rows]
+            self._ensure_table_and_columns(table, required)
+            with self._transaction() as connection:
+                connection.execute(query, (*values, status))
+                rows = connection.execute(f"SELECT * FROM {table} WHERE status = ?", (status,)).fetchall()
+            return [dict(row) for row in rows]
 
         return method
 
-    def _parse_set_by_two_columns(self, name: str):
+    def _parse_set_by_two_columns(self, name: str, column: str, filter1: str, filter2: str):
         """ set_{column}_by_{column}_and_{column}(value, filter1, filter2) """
 
-        match = re.match(r"^set_(\w+)_by_(\w+)_and_(\w+)$", name)
-        if not match:
-            return None
-        column, filter1, filter2 = match.groups()
         table = _guess_table_from_method(name)
         query = f"UPDATE {table} SET {column} = ? WHERE {filter1} = ? AND {filter2}=?"
-        _log_call_context(name)
-        logger.debug(f"Prepared SQL query: {query}")
+        logger.debug("Prepared SQL query: %s", query)
+
+        required = (column, filter1, filter2)
 
         def method(value_to_set, filter1_value, filter2_value):
             """ Sets columns with two filters """
 
             _log_call_context(name)
-            self._ensure_table_and_columns(table, [column, filter1, filter2])
-            with self.connection:
-                self.cursor.execute(query, (value_to_set, filter1_value, filter2_value))
-                self.connection.commit()
-                self.cursor.execute(f"SELECT * FROM {table} WHERE {filter1}=? AND {filter2}=?", (filter1_value, filter2_value))
-                rows = self.cursor.fetchall()
-                self.cursor.execute(f"PRAGMA table_info({table})")
-                columns = [row[1] for row in self.cursor.fetchall()]
-                return [dict(zip(columns, row)) for row in rows]
+            self._ensure_table_and_columns(table, required)
+            with self._transaction() as connection:
+                connection.execute(query, (value_to_set, filter1_value, filter2_value))
+                rows = connection.execute(f"SELECT * FROM {table} WHERE {filter1}=? AND {filter2}=?", (filter1_value, filter2_value)).fetchall()
+                return [dict(row) for row in rows]
 
         return method
 
-    def _parse_set_by_column(self, name: str):
-        """ set_{column}_by_{column}(value, filter) """
-
-        match = re.match(r"^set_(\w+)_by_(\w+)$", name)
-        if not match:
-            return None
-        column, by_column = match.groups()
+    def _parse_set_by_column(self, name: str, column: str, by_column: str):
+        """ set_{column}_by_{column}(value, filter), set_{column}_by_{column}.many([(value, filter), ...]) """
 
         table = _guess_table_from_method(name)
 
@@ -259,189 +512,342 @@ class AutoDB:
                 table += "s"
             query = f"UPDATE {table} SET {column}=? WHERE {by_column}=?"
 
-        _log_call_context(name)
-        logger.debug(f"Prepared SQL query: {query}")
+        logger.debug("Prepared SQL query: %s", query)
+
+        required = (column, by_column, "status")
 
         def method(value_to_set, filter_value):
             """ Sets columns with filter """
 
             _log_call_context(name)
-            self._ensure_table_and_columns(table, [column, by_column, "status"])
-            with self.connection:
-                self.cursor.execute(query, (value_to_set, filter_value))
-                self.connection.commit()
+            self._ensure_table_and_columns(table, required)
+            with self._transaction() as connection:
+                connection.execute(query, (value_to_set, filter_value))
+                rows = connection.execute(f"SELECT * FROM {table} WHERE {by_column}=?", (filter_value,)).fetchall()
+                return [dict(row) for row in rows]
 
-                self.cursor.execute(f"SELECT * FROM {table} WHERE {by_column}=?", (filter_value,))
-                rows = self.cursor.fetchall()
-                self.cursor.execute(f"PRAGMA table_info({table})")
-                columns = [row[1] for row in self.cursor.fetchall()]
-                return [dict(zip(columns, row)) for row in rows]
+        def many(pairs):
+            """ Sets columns for every (value, filter) pair in one transaction """
 
+            _log_call_context(name)
+            pairs = list(pairs)
+            self._ensure_table_and_columns(table, required)
+            with self._transaction() as connection:
+                connection.executemany(query, pairs)
+            logger.info("Updated %s rows of %s", len(pairs), table)
+
+        method.many = many
         return method
 
-    def _parse_set_status_method(self, name: str):
+    def _parse_set_status_method(self, name: str, table: str):
         """ Parses methods like set_{table}_status(arg1, status) """
 
-        match = re.fullmatch(r"set_(\w+)_status", name)
-
-        if not match:
-            return None
-
-        table = match.group(1)
         if not table.endswith("s"):
             table += "s"
 
         query = f"UPDATE {table} SET status=? WHERE id=?"
-        _log_call_context(name)
-        logger.debug(f"Prepared SQL query: {query}")
+        logger.debug("Prepared SQL query: %s", query)
+
+        required = ("status",)
 
         def method(id_value, status_value):
             """ Set status method """
 
             _log_call_context(name)
-            self._ensure_table_and_columns(table, ["status"])
-            with self.connection:
-                self.cursor.execute(query, (status_value, id_value))
-                self.connection.commit()
-                self.cursor.execute(f"SELECT * FROM {table} WHERE id=?", (id_value,))
-                rows = self.cursor.fetchall()
-                self.cursor.execute(f"PRAGMA table_info({table})")
-                columns = [row[1] for row in self.cursor.fetchall()]
-                return [dict(zip(columns, row)) for row in rows]
+            self._ensure_table_and_columns(table, required)
+            with self._transaction() as connection:
+                connection.execute(query, (status_value, id_value))
+                rows = connection.execute(f"SELECT * FROM {table} WHERE id=?", (id_value,)).fetchall()
+                return [dict(row) for row in rows]
 
         return method
 
     # ------------------ Utilities ------------------
-    def _ensure_table_and_columns(self, table: str, columns: list):
+    @contextmanager
+    def _transaction(self):
+        """ Runs enclosed statements on the writer connection in one transaction """
+
+        with self._write_lock:
+            if self.connection.in_transaction:
+                # nested call, outer transaction commits
+                yield self.connection
+                return
+
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                if self.connection.in_transaction:
+                    self.connection.execute("ROLLBACK")
+                raise
+            if self.connection.in_transaction:
+                self.connection.execute("COMMIT")
+
+    def _stream_rows(self, query: str, params: tuple, size: int):
+        """ Yields rows of a SELECT fetched in batches of size from a pooled reader """
+
+        if self._readers is None:
+            # in-memory database reads through the writer, its lock must not be held between yields
+            with self._write_lock:
+                rows = self.connection.execute(query, params).fetchall()
+            yield from rows
+            return
+
+        with self._readers.acquire() as connection:
+            cursor = connection.execute(query, params)
+            while rows := cursor.fetchmany(size):
+                yield from rows
+
+    @contextmanager
+    def _autocommit(self):
+        """ Gives the writer connection for a statement outside of a transaction """
+
+        with self._write_lock:
+            yield self.connection
+
+    @contextmanager
+    def _read_connection(self):
+        """ Gives a connection for SELECT queries """
+
+        if self._readers is None:
+            with self._write_lock:
+                yield self.connection
+        else:
+            with self._readers.acquire() as connection:
+                yield connection
+
+    def _ensure_table_and_columns(self, table: str, columns: tuple):
         """ Checks if table and columns exist and creates them if not """
 
-        with self.connection:
-            self.cursor.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name = ?", (table,)
-            )
-            if not self.cursor.fetchone():
-                logger.warning(f"Table '{table}' does not exist. Creating...")
-                self._create_table(table)
-
-            self.cursor.execute(f"PRAGMA table_info({table})")
-            existing = {row[1] for row in self.cursor.fetchall()}
-            for column in columns:
-                if column not in existing:
-                    logger.warning(f"Column '{column}' does not exist in '{table}'. Creating...")
-                    sql = f"ALTER TABLE {table} ADD COLUMN {column} TEXT"
-                    logger.debug(f"Executing SQL: {sql}")
-                    self.cursor.execute(sql)
-
-    def _create_table(self, table: str):
-        """ Creates a table with just an id column """
-
-        sql = f"CREATE TABLE {table} (id INTEGER PRIMARY KEY AUTOINCREMENT)"
-        logger.debug(f"Creating table '{table}' with SQL: {sql}")
-        self.cursor.execute(sql)
-
-    def execute(self, sql: str, params: tuple = None):
-        """ Execute a custom SQL query with optional parameters """
-
-        logger.debug(f"Executing custom SQL: {sql}")
+        key = (table, columns)
+        if key in self._verified:
+            return
+
+        existing = self._schema.get(table)
+        if existing is None or not existing.issuperset(columns):
+            with self._transaction():
+                # another connection (API, scheduler) may have changed the table, reread it before any ALTER
+                self._schema.pop(table, None)
+                # a missing table is created with all requested columns at once
+                existing = self._load_table(table, columns)
+                for column in columns:
+                    if column not in existing:
+                        logger.warning("Column '%s' does not exist in '%s'. Creating...", column, table)
+                        self._add_column(table, column)
+        self._verified.add(key)
+
+    def _load_table(self, table: str, columns: tuple = ()) -> set:
+        """ Returns cached columns of the table, reads them from SQLite (creating the table) on first use """
+
+        existing = self._schema.get(table)
+        if existing is not None:
+            return existing
+
+        with self._transaction() as connection:
+            # table_info of a missing table is empty, so it doubles as the existence check
+            existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+            if not existing:
+                logger.warning("Table '%s' does not exist. Creating with columns: %s", table, columns)
+                self._create_table(table, columns)
+                existing = {"id", *columns}
+            elif "status" in existing:
+                # tables created before status was indexed get the index on first load
+                self._create_status_index(table)
+
+        self._schema[table] = existing
+        return existing
+
+    def _create_table(self, table: str, columns: tuple = ()):
+        """ Creates a table with an id column and TEXT columns in one statement """
+
+        columns = [column for column in dict.fromkeys(columns) if column != "id"]
+        definitions = ", ".join(["id INTEGER PRIMARY KEY AUTOINCREMENT", *(f"{column} TEXT" for column in columns)])
+        sql = f"CREATE TABLE {table} ({definitions})"
+        logger.debug("Creating table '%s' with SQL: %s", table, sql)
+        self.connection.execute(sql)
+        if "status" in columns:
+            self._create_status_index(table)
+
+    def _add_column(self, table: str, column: str):
+        """ Adds a TEXT column to the table and to the schema cache """
+
+        sql = f"ALTER TABLE {table} ADD COLUMN {column} TEXT"
+        logger.debug("Executing SQL: %s", sql)
+        self.connection.execute(sql)
+        if column == "status":
+            self._create_status_index(table)
+        self._load_table(table).add(column)
+
+    def _create_status_index(self, table: str):
+        """ Indexes status column, generated methods and pollers filter by it """
+
+        self.connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_status ON {table}(status)")
+
+    def fetch_column(self, table: str, column: str) -> list:
+        """ Returns values of a single column as a flat list """
+
+        self._ensure_table_and_columns(table, (column,))
+        with self._read_connection() as connection:
+            rows = connection.execute(f"SELECT {column} FROM {table}").fetchall()
+        logger.info("Returned %s values of column: %s", len(rows), column)
+        return list(map(itemgetter(0), rows))
+
+    def enqueue_insert(self, table: str, columns: tuple, values: tuple):
+        """ Queues a row to be inserted by insert_writer() """
+
+        self._insert_queue.put_nowait((table, tuple(columns), tuple(values)))
+
+    async def insert_writer(self):
+        """
+        Background task which coalesces queued inserts and writes them with executemany.
+        Rows taken off the queue stay in self._pending_inserts until written, on cancel the running write
+        is waited for and the rest is left for flush_inserts().
+        """
+
+        pending = self._pending_inserts
+        while True:
+            if not pending:
+                pending.append(await self._insert_queue.get())
+            if self._insert_queue.qsize() < self.INSERT_BATCH_SIZE - len(pending):
+                # give concurrent requests a moment to join the batch
+                await asyncio.sleep(self.INSERT_BATCH_DELAY)
+            while len(pending) < self.INSERT_BATCH_SIZE and not self._insert_queue.empty():
+                pending.append(self._insert_queue.get_nowait())
+
+            # sqlite calls block, keep them off the event loop
+            write = asyncio.ensure_future(asyncio.to_thread(self._write_pending))
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                # the thread can't be interrupted, let it finish before the database is closed
+                with suppress(Exception):
+                    await write
+                raise
+            except Exception as e:
+                # only lock contention gets here, rows are kept and retried with the next batch
+                logger.error("Failed to write %s queued inserts, will retry: %s", len(pending), e)
+                await asyncio.sleep(self.INSERT_RETRY_DELAY)
+
+    def flush_inserts(self):
+        """ Writes every pending and queued insert right away, used on shutdown. Raises if the database stays locked """
+
+        while not self._insert_queue.empty():
+            self._pending_inserts.append(self._insert_queue.get_nowait())
+        self._write_pending()
+
+    def _write_pending(self):
+        """
+        Writes rows from self._pending_inserts and removes them only once they are committed.
+        Lock errors are raised with the rows kept, a batch failing for any other reason is written row by row
+        and rows which still fail are logged and dropped, so one bad row doesn't block the ones behind it.
+        """
+
+        batch = self._pending_inserts[:]
+        if not batch:
+            return
+        try:
+            self._flush_inserts(batch)
+        except Exception as e:
+            if _is_busy_error(e):
+                raise
+            logger.warning("Batch of %s queued inserts failed, writing them one by one: %s", len(batch), e)
+            self._write_rows(batch)
+        del self._pending_inserts[:len(batch)]
+
+    def _write_rows(self, batch: list):
+        """ Writes queued inserts one transaction each, on lock errors the written rows are removed and it raises """
+
+        for written, row in enumerate(batch):
+            try:
+                self._flush_inserts([row])
+            except Exception as e:
+                if _is_busy_error(e):
+                    del self._pending_inserts[:written]
+                    raise
+                table, columns, values = row
+                logger.error("Dropped queued insert into %s: %s | values=%r", table, e, values)
+
+    def _flush_inserts(self, batch: list):
+        """ Writes queued inserts grouped by table and columns in one transaction """
+
+        groups = {}
+        for table, columns, values in batch:
+            groups.setdefault((table, columns), []).append(values)
+
+        for table, columns in groups:
+            self._ensure_table_and_columns(table, columns)
+
+        with self._transaction() as connection:
+            for (table, columns), rows in groups.items():
+                placeholders = ", ".join("?" * len(columns))
+                connection.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+                )
+        logger.info("Inserted %s queued rows into %s table(s)", len(batch), len(groups))
+
+    def close(self):
+        """ Closes reader pool and writer connection """
+
+        # waits for a write running in another thread
+        with self._write_lock:
+            if self._readers is not None:
+                self._readers.close()
+            self.connection.close()
+        if self._shared_key is not None:
+            with self._shared_lock:
+                self._shared.pop(self._shared_key, None)
+        logger.debug("Database connection closed")
+
+    async def execute_async(
+        self, sql: str, params: tuple = None, *, ensure_schema: bool = True, is_select: bool = None
+    ):
+        """ execute() in a worker thread, for use from async code """
+
+        return await asyncio.to_thread(self.execute, sql, params, ensure_schema=ensure_schema, is_select=is_select)
+
+    def execute(self, sql: str, params: tuple = None, *, ensure_schema: bool = True, is_select: bool = None):
+        """
+        Execute a custom SQL query with optional parameters.
+        ensure_schema=False skips creating missing tables and columns, for queries on a known schema.
+        is_select tells whether the query only reads, otherwise it is sniffed from the SQL.
+        """
+
+        logger.debug("Executing custom SQL: %s", sql)
         if params:
-            logger.debug(f"With parameters: {params}")
-
-        sql_lower = sql.lower()
+            logger.debug("With parameters: %s", params)
 
         # ------------------------------
-        # 1. Detect table names
+        # 1. Ensure tables and columns exist, cached schema makes this free after first call
         # ------------------------------
-        tables = set()
-
-        # SELECT ... FROM table
-        m = re.findall(r"from\s+(\w+)", sql_lower)
-        tables.update(m)
-
-        # JOIN table
-        m = re.findall(r"join\s+(\w+)", sql_lower)
-        tables.update(m)
-
-        # INSERT INTO table
-        m = re.findall(r"insert\s+into\s+(\w+)", sql_lower)
-        tables.update(m)
-
-        # UPDATE table
-        m = re.findall(r"update\s+(\w+)", sql_lower)
-        tables.update(m)
-
-        # DELETE FROM table
-        m = re.findall(r"delete\s+from\s+(\w+)", sql_lower)
-        tables.update(m)
+        if ensure_schema:
+            tables, columns = _analyze_sql(sql)
+            for table in tables:
+                self._ensure_table_and_columns(table, columns)
 
         # ------------------------------
-        # 2. Ensure tables exist
+        # 2. Run actual query
         # ------------------------------
-        for table in tables:
-            with self.connection:
-                self.cursor.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table' AND name = ?", (table,)
-                )
-                if not self.cursor.fetchone():
-                    logger.warning(f"[execute] Table '{table}' does not exist. Creating...")
-                    self._create_table(table)
+        if is_select is None:
+            is_select = _RE_SELECT.match(sql) is not None
+        if is_select:
+            # reads need no transaction
+            with self._read_connection() as connection:
+                result = connection.execute(sql, params or ()).fetchall()
+            logger.info("Custom SQL returned %s rows", len(result))
+            return [dict(row) for row in result]
 
-        # ------------------------------
-        # 3. Detect columns from SELECT/WHERE
-        # ------------------------------
-        for table in tables:
-            self.cursor.execute(f"PRAGMA table_info({table})")
-            existing_cols = {row[1] for row in self.cursor.fetchall()}
-
-            # SELECT column1, column2 FROM table
-            m = re.search(r"select\s+(.*?)\s+from", sql_lower)
-            if m:
-                raw = m.group(1)
-                if raw.strip() != "*" and "(" not in raw:
-                    cols = [c.strip() for c in raw.split(",")]
-                    for col in cols:
-                        if col not in existing_cols:
-                            logger.warning(f"[execute] Column '{col}' does not exist in '{table}'. Creating...")
-                            self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} TEXT")
-                            existing_cols.add(col)
-
-            # WHERE column = ?
-            m = re.findall(r"where\s+(\w+)\s*=", sql_lower)
-            for col in m:
-                if col not in existing_cols:
-                    logger.warning(f"[execute] Column '{col}' does not exist in '{table}'. Creating...")
-                    self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} TEXT")
-                    existing_cols.add(col)
-
-            # UPDATE table SET column = ...
-            m = re.findall(r"set\s+(\w+)\s*=", sql_lower)
-            for col in m:
-                if col not in existing_cols:
-                    logger.warning(f"[execute] Column '{col}' does not exist in '{table}'. Creating...")
-                    self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} TEXT")
-                    existing_cols.add(col)
-
-            # INSERT INTO table (col1, col2, ...)
-            m = re.search(r"insert\s+into\s+\w+\s*\((.*?)\)", sql_lower)
-            if m:
-                cols = [c.strip() for c in m.group(1).split(",")]
-                for col in cols:
-                    if col not in existing_cols:
-                        logger.warning(f"[execute] Column '{col}' does not exist in '{table}'. Creating...")
-                        self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} TEXT")
-                        existing_cols.add(col)
+        if _RE_DML.match(sql):
+            # data changes run in a transaction, like sqlite3's implicit one before DML
+            writer = self._transaction()
+        else:
+            # DDL and statements like VACUUM run in autocommit, VACUUM can't run inside a transaction
+            writer = self._autocommit()
 
-        # ------------------------------
-        # 4. Run actual query
-        # ------------------------------
-        with self.connection:
-            if params:
-                self.cursor.execute(sql, params)
-            else:
-                self.cursor.execute(sql)
-
-            if sql_lower.strip().startswith("select"):
-                result = self.cursor.fetchall()
-                logger.info(f"Custom SQL returned {len(result)} rows")
-                return [dict(row) for row in result]
-            else:
-                logger.info("Custom SQL executed successfully")
+        with writer as connection:
+            connection.execute(sql, params or ())
+
+            if _RE_SCHEMA_CHANGE.match(sql):
+                # schema was changed outside of AutoDB, reload it on next use
+                self._schema.clear()
+                self._verified.clear()
+        logger.info("Custom SQL executed successfully")
@@ -7,23 +7,57 @@ from logger import logger
 from task import Task
 import asyncio
 import config
+import os
+
+# pending jobs are processed by a fixed number of workers, the queue holds the rest
+WORKERS = min((os.cpu_count() or 1) * 2, 32)
+QUEUE_SIZE = 1000
 
 
 async def process_task(task: Task, payload):
     """ Processes generic task """
 
-    logger.debug(f"Processing task: {task.name} | payload={payload}")
-
-    task.set_status(payload, "processing")
+    logger.debug("Processing task: %s | payload=%s", task.name, payload)
 
+    # payload is already claimed as "processing" by fetch_pending
+    # task db methods are blocking sqlite calls, they run in worker threads
     try:
         result = await task.process(payload)
-        task.save_result(payload, result)
-        task.set_status(payload, "waiting")
-        logger.info(f"Task '{task.name}' processed, waiting for user delivery")
+        await asyncio.to_thread(task.save_result, payload, result)
+        await asyncio.to_thread(task.set_status, payload, "waiting")
+        logger.info("Task '%s' processed, waiting for user delivery", task.name)
     except Exception as e:
-        logger.error(f"Task '{task.name}' failed: {e}")
-        task.set_status(payload, "error")
+        logger.error("Task '%s' failed: %s", task.name, e)
+        await asyncio.to_thread(task.set_status, payload, "error")
+
+
+def fetch_pending():
+    """
+    Fetches pending jobs of every task type, returns (task, payload) pairs.
+    Jobs are claimed as "processing" right away, so later polls don't fetch them again while they wait in the queue.
+    """
+
+    pending = []
+    for task in TASKS.values():
+        payload = task.db_fetch()
+        if payload:
+            task.set_status(payload, "processing")
+            pending.append((task, payload))
+    return pending
+
+
+async def worker(queue: asyncio.Queue):
+    """ Processes queued jobs one by one """
+
+    while True:
+        task, payload = await queue.get()
+        try:
+            await process_task(task, payload)
+        except Exception:
+            # e.g. the database is locked while setting "error", the worker must outlive the job
+            logger.exception("Worker failed on task '%s' | payload=%s", task.name, payload)
+        finally:
+            queue.task_done()
 
 
 async def poll_tasks():
@@ -31,14 +65,20 @@ async def poll_tasks():
     Periodically checks all task types for pending jobs and processes them.
     """
 
-    logger.info("Task polling started")
+    logger.info("Task polling started with %s workers", WORKERS)
 
-    while True:
-        for task in TASKS.values():
-            payload = task.db_fetch()
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    workers = [asyncio.create_task(worker(queue)) for _ in range(WORKERS)]
 
-            if payload:
-                logger.info(f"Task '{task.name}' has work: {payload}")
-                asyncio.create_task(process_task(task, payload))
+    try:
+        while True:
+            await asyncio.sleep(config.REQUEST_INTERVAL)
 
-        await asyncio.sleep(config.REQUEST_INTERVAL)
+            # all services are polled in one worker thread hop per tick
+            for task, payload in await asyncio.to_thread(fetch_pending):
+                logger.info("Task '%s' has work: %s", task.name, payload)
+                # waits when the queue is full, so a backlog doesn't spawn unbounded coroutines
+                await queue.put((task, payload))
+    finally:
+        for worker_task in workers:
+            worker_task.cancel()
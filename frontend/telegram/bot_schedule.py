@@ -2,16 +2,28 @@
 
 import asyncio
 from core.method_generator import AutoDB
+from core.logger import logger
 from aiogram import Bot
+from aiogram.utils.exceptions import BotBlocked, CantInitiateConversation, ChatNotFound, UserDeactivated
 
-db = AutoDB()
+# Telegram allows about 30 messages per second
+SEND_CONCURRENCY = 30
+
+# ids per UPDATE, stays below SQLite's limit of bound variables (999 in older builds)
+UPDATE_CHUNK_SIZE = 500
+
+# sending to these users will never succeed, their requests are marked "error" instead of retried
+PERMANENT_ERRORS = (BotBlocked, CantInitiateConversation, ChatNotFound, UserDeactivated)
 
 
 class BotScheduler:
-    def __init__(self, bot_token: str, services: list, interval: int = 2):
+    def __init__(self, bot_token: str, services: list, db: AutoDB, interval: int = 2):
+        # db is shared with the rest of the app instead of opening another connection
+        self.db = db
         self.bot = Bot(token=bot_token)
         self.services = services
         self.interval = interval
+        self._checked_tables = set()
 
     async def start(self):
         while True:
@@ -21,8 +33,46 @@ class BotScheduler:
 
     async def _check_service(self, service_name: str):
         table = f"{service_name}_requests"
-        for row in db.execute(f"SELECT id, user_id, status, image_url FROM {table}"):
-            task_id, user_id, status, image_url = row
-            if status == "waiting" and image_url:
-                await self.bot.send_message(user_id, f"Ваш результат готов: {image_url}")
-                db.execute(f"UPDATE {table} SET status = ? WHERE id = ?", ("done", task_id))
+        # schema is checked (and created if missing) on the first poll only
+        rows = await self.db.execute_async(
+            f"SELECT id, user_id, image_url FROM {table} WHERE status = ? AND image_url IS NOT NULL",
+            ("waiting",),
+            ensure_schema=table not in self._checked_tables,
+            is_select=True,
+        )
+        self._checked_tables.add(table)
+        if not rows:
+            return
+
+        semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+
+        async def send(row):
+            async with semaphore:
+                await self.bot.send_message(row["user_id"], f"Ваш результат готов: {row['image_url']}")
+
+        results = await asyncio.gather(*(send(row) for row in rows), return_exceptions=True)
+        done_ids, error_ids = [], []
+        for row, result in zip(rows, results):
+            if not isinstance(result, Exception):
+                done_ids.append(row["id"])
+                continue
+            logger.error("Failed to send result of %s request %s to user %s: %s", service_name, row["id"],
+                         row["user_id"], result)
+            if isinstance(result, PERMANENT_ERRORS):
+                error_ids.append(row["id"])
+
+        await self._set_status(table, "done", done_ids)
+        await self._set_status(table, "error", error_ids)
+
+    async def _set_status(self, table: str, status: str, ids: list):
+        """ Sets status of the rows in chunks of UPDATE_CHUNK_SIZE ids """
+
+        for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+            chunk = ids[start:start + UPDATE_CHUNK_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            await self.db.execute_async(
+                f"UPDATE {table} SET status = ? WHERE id IN ({placeholders})",
+                (status, *chunk),
+                ensure_schema=False,
+                is_select=False,
+            )
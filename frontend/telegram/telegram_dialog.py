@@ -4,8 +4,13 @@ from aiogram import Bot, Dispatcher, types
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.dispatcher import FSMContext
+from core.logger import logger
 import core.config as config
 import aiohttp
+import asyncio
+
+# max backend requests in flight at once
+API_CONCURRENCY = 50
 
 
 class DynamicStates(StatesGroup):
@@ -17,6 +22,11 @@ class TelegramDialogManager:
         self.bot = Bot(token=bot_token)
         self.dp = Dispatcher(self.bot, storage=MemoryStorage())
         self.api_description = api_description
+        # one keep-alive HTTP session to the backend, created on first request
+        self._session: aiohttp.ClientSession | None = None
+        self._api_semaphore = asyncio.Semaphore(API_CONCURRENCY)
+        # strong references to background sends, so they are not garbage collected mid-flight
+        self._api_tasks = set()
 
     def register_service(self, service_name: str):
         api = self.api_description[service_name]
@@ -35,16 +45,38 @@ class TelegramDialogManager:
             payload = {arg: message.text for arg in api['handle']['args']}
             payload['user_id'] = message.from_user.id
 
-            # Отправка на backend API
-            await self._send_to_api(service, payload)
+            # Отправка на backend API в фоне, пользователь получает ответ сразу
+            task = asyncio.create_task(self._send_to_api_bounded(service, payload))
+            self._api_tasks.add(task)
+            task.add_done_callback(self._api_tasks.discard)
             await message.answer("Ваш запрос принят. Как только результат будет готов, я пришлю его.")
             await state.finish()
 
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60))
+        return self._session
+
     async def _send_to_api(self, service_name: str, payload: dict):
         url = f"http://localhost:{config.BACKEND_PORT}/api/{service_name}/handle"
-        async with aiohttp.ClientSession() as session:
-            await session.post(url, json=payload)
+        session = await self._get_session()
+        # leaving the context releases the connection back to the pool
+        async with session.post(url, json=payload):
+            pass
+
+    async def _send_to_api_bounded(self, service_name: str, payload: dict):
+        async with self._api_semaphore:
+            try:
+                await self._send_to_api(service_name, payload)
+            except Exception as e:
+                logger.error("Failed to send request to '%s' API: %s", service_name, e)
+
+    async def _on_shutdown(self, dp: Dispatcher):
+        # requests already answered with "accepted" finish before their session goes away
+        await asyncio.gather(*self._api_tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
 
     def run(self):
         from aiogram import executor
-        executor.start_polling(self.dp, skip_updates=True)
+        executor.start_polling(self.dp, skip_updates=True, on_shutdown=self._on_shutdown)
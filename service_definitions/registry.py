@@ -1,20 +1,96 @@
 """ Service registry """
 
+from collections.abc import Mapping
 import importlib
 import pkgutil
+import json
 import os
 
-TASKS = {}
-
 SERVICES_PATH = os.path.join(os.path.dirname(__file__), "..", "services")
 SERVICES_PATH = os.path.abspath(SERVICES_PATH)
 
-# auto import all packages in services/
-for module_info in pkgutil.iter_modules([SERVICES_PATH]):
-    module_name = module_info.name
-    full_path = f"services.{module_name}.service"
-    module = importlib.import_module(full_path)
+# discovered services, reused while services/ and package __init__ files are unchanged
+CACHE_PATH = os.path.join(os.path.dirname(__file__), ".services.cache")
+
+
+def _package_mtimes(path: str, packages) -> dict:
+    """ Modification times of package __init__ files, where SERVICE_NAME is declared """
+
+    return {package: os.stat(os.path.join(path, package, "__init__.py")).st_mtime_ns for package in packages}
+
+
+def _load_cache(path: str) -> dict | None:
+    """ Returns cached {service name: package} if nothing in services/ changed since it was written """
+
+    try:
+        with open(CACHE_PATH) as file:
+            cache = json.load(file)
+        if cache["path"] != path or cache["mtime"] != os.stat(path).st_mtime_ns:
+            return None
+        if cache["packages"] != _package_mtimes(path, cache["services"].values()):
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return cache["services"]
+
+
+def _save_cache(path: str, services: dict):
+    """ Writes discovered services, a read-only checkout just skips caching """
+
+    cache = {
+        "path": path,
+        "mtime": os.stat(path).st_mtime_ns,
+        "packages": _package_mtimes(path, services.values()),
+        "services": services,
+    }
+    try:
+        with open(CACHE_PATH, "w") as file:
+            json.dump(cache, file)
+    except OSError:
+        pass
+
+
+class _TaskRegistry(Mapping):
+    """
+    Service name -> SERVICE object, service modules are imported on first access.
+    Only packages are imported at startup, every package must declare SERVICE_NAME in __init__.py
+    """
+
+    def __init__(self):
+        self._paths = {}
+        self._services = {}
+
+    def discover(self, path: str):
+        """ Finds packages in services/ without importing their service modules """
+
+        services = _load_cache(path)
+        if services is None:
+            services = {}
+            for module_info in pkgutil.iter_modules([path]):
+                package = importlib.import_module(f"services.{module_info.name}")
+                services[package.SERVICE_NAME] = module_info.name
+            _save_cache(path, services)
+
+        for name, package in services.items():
+            self._paths[name] = f"services.{package}.service"
+
+    def __getitem__(self, name: str):
+        service_obj = self._services.get(name)
+        if service_obj is None:
+            # every service must provide SERVICE object
+            service_obj = importlib.import_module(self._paths[name]).SERVICE
+            self._services[name] = service_obj
+        return service_obj
+
+    def __contains__(self, name):
+        return name in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
 
-    # every service must provide SERVICE object
-    service_obj = module.SERVICE
-    TASKS[service_obj.name] = service_obj
+TASKS = _TaskRegistry()
+TASKS.discover(SERVICES_PATH)
@@ -1 +1,4 @@
 """ Service1 package """
+
+# read by service registry without importing the service module
+SERVICE_NAME = "image_service"
@@ -1,3 +1,10 @@
 from core.method_generator import AutoDB
 
-db = AutoDB()
+db = AutoDB.shared()
+
+# methods used by ImageTask, generated once at import
+db.precompile((
+    "get_url_and_user_id_with_pending_images",
+    "set_image_status_by_user_id",
+    "set_image_by_user_id",
+))
@@ -4,6 +4,7 @@ from core.logger import logger
 from core.task import Task
 from .db_methods import *
 from .client import send_to_generator
+from . import SERVICE_NAME
 
 
 class ImageTask(Task):
@@ -28,7 +29,8 @@ class ImageTask(Task):
             logger.warning("Payload is empty, cannot set status")
             return
 
-        db.set_image_status_by_user_id(status, payload[0]["user_id"])
+        # one transaction for the whole payload
+        db.set_image_status_by_user_id.many((status, row["user_id"]) for row in payload)
 
     def save_result(self, payload, result):
         """ Saves request result """
@@ -37,7 +39,7 @@ class ImageTask(Task):
             logger.warning("Payload is empty, cannot save result")
             return
 
-        db.set_image_by_user_id(result, payload[0]["user_id"])
+        db.set_image_by_user_id.many((result, row["user_id"]) for row in payload)
 
 
-SERVICE = ImageTask("image_service")
+SERVICE = ImageTask(SERVICE_NAME)
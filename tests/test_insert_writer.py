@@ -0,0 +1,36 @@
+from core.method_generator import AutoDB
+import asyncio
+
+COLUMNS = ("user_id", "text", "status")
+
+
+def test_bad_row_does_not_block_queue():
+    """ A row sqlite can't bind is dropped, rows queued around it are still written """
+
+    db = AutoDB(":memory:")
+
+    async def run():
+        writer = asyncio.create_task(db.insert_writer())
+        db.enqueue_insert("requests", COLUMNS, (1, "a", "pending"))
+        db.enqueue_insert("requests", COLUMNS, ([1, 2], "b", "pending"))
+        db.enqueue_insert("requests", COLUMNS, (2 ** 70, "c", "pending"))
+        db.enqueue_insert("requests", COLUMNS, (6, "d", "pending"))
+        await asyncio.sleep(0.2)
+        db.enqueue_insert("requests", COLUMNS, (7, "e", "pending"))
+        await asyncio.sleep(0.2)
+        writer.cancel()
+        try:
+            await writer
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    db.flush_inserts()
+    rows = db.execute("SELECT user_id FROM requests ORDER BY id", (), is_select=True)
+    assert [row["user_id"] for row in rows] == ["1", "6", "7"]
+    db.close()
+
+
+if __name__ == "__main__":
+    test_bad_row_does_not_block_queue()
+    print("ok")